@@ -1,26 +1,37 @@
 import base64
+import functools
 import getpass
+import hashlib
+import hmac
 import json
 import logging
 import os
 import os.path as op
+import random
 import re
 import sys
 import tempfile
+import threading
 import time
 import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import requests
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-import higlass.client as hgc
-import higlass.utils as hgu
 import slugid
-from higlass import Track
 
-# from higlass.utils import fill_filetype_and_datatype
-from resgen import aws
+# higlass, numpy, boto3 (through resgen.aws) and dotenv are slow to import
+# and only needed by some functions so they are imported where they're used
+if typing.TYPE_CHECKING:
+    import numpy as np
 
 # import resgen.utils as rgu
 logging.basicConfig(level=logging.INFO)
@@ -39,15 +50,83 @@ RESGEN_AUTH0_DOMAIN = "https://auth.resgen.io"
 # off paging in requests
 MAX_LIMIT = int(1e6)
 
+# where tokens are cached between connections
+TOKEN_CACHE_DIR = Path.home() / ".resgen" / "token_cache"
+# pbkdf2 iterations used to hash the password a cached token belongs to
+TOKEN_CACHE_ITERATIONS = 100000
+
+# use orjson for (de)serialization when it's available
+if orjson is not None:
+    json_loads = orjson.loads
+
+    def json_dumps_bytes(obj) -> bytes:
+        """Serialize an object to UTF-8 encoded JSON."""
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def json_dumps(obj) -> str:
+        """Serialize an object to a JSON string."""
+        return json_dumps_bytes(obj).decode("utf8")
+
+else:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+    def json_dumps_bytes(obj) -> bytes:
+        """Serialize an object to UTF-8 encoded JSON."""
+        return json.dumps(obj).encode("utf8")
+
+# initial interval, growth factor and cap (in seconds) used when
+# polling the server for download progress
+POLL_INTERVAL = 0.5
+POLL_BACKOFF = 1.7
+MAX_POLL_INTERVAL = 30.0
+# give up on a download after this many consecutive failed progress polls
+MAX_PROGRESS_FAILURES = 5
+# fraction by which each polling interval is randomly shortened
+POLL_JITTER = 0.2
+
+# how long (in seconds) a retrieved dataset is reused for
+DATASET_CACHE_TTL = 30
+
+# number of datasets to sync concurrently when syncing a track hub
+SYNC_WORKERS = 8
+# the number of datasets to request per page when listing all of them
+DATASET_PAGE_SIZE = 200
+
+# (connect, read) timeout in seconds passed to every request
+REQUEST_TIMEOUT = (5, 60)
+
+
+# separates the stanzas of a UCSC hub / trackDb file
+UCSC_SECTION_SEPARATOR = re.compile("\n\n+")
 
-def parse_ucsc(hub_string):
-    # print("hub_string:", hub_string)
+
+def parse_ucsc(hub_string: typing.Union[str, bytes]):
+    """Parse a UCSC hub, genomes or trackDb file.
+
+    Args:
+        hub_string: The contents of the file. Bytes are decoded as utf8.
+
+    Returns:
+        A list with a dictionary of settings for each stanza
+    """
+    if isinstance(hub_string, bytes):
+        hub_string = hub_string.decode("utf8")
 
     things = []
-    for hub_section in re.split("\n\n+", hub_string.strip()):
-        parts = [d.split(maxsplit=1) for d in hub_section.split("\n") if d[0] != "#"]
-        if parts:
-            things += [dict(parts)]
+    for hub_section in UCSC_SECTION_SEPARATOR.split(hub_string.strip()):
+        section = {}
+
+        for line in hub_section.split("\n"):
+            parts = line.split(None, 1)
+
+            if not parts or parts[0][0] == "#":
+                continue
+
+            section[parts[0]] = parts[1] if len(parts) > 1 else ""
+
+        if section:
+            things += [section]
 
     return things
 
@@ -58,12 +137,125 @@ def update_tags(current_tags, **kwargs):
     If a tag type (e.g. 'datatype') that is already in current_tags
     is specified as part of kwargs, then it overwrites the one in
     current_tags.
+
+    Tags are keyed by their full name so repeated tags are only kept
+    once. A type can still have several values (e.g. 'cell:a' and
+    'cell:b').
+    """
+    # a single pass over the current tags with O(1) lookups of the
+    # tag types being replaced
+    tags = {
+        t["name"]: t for t in current_tags if t["name"].split(":", 1)[0] not in kwargs
+    }
+    for tag, value in kwargs.items():
+        name = f"{tag}:{value}"
+        tags[name] = {"name": name}
+
+    return list(tags.values())
+
+
+def token_expiry(token: str) -> typing.Optional[float]:
+    """Return the time after which a JWT should be refreshed.
+
+    The `exp` claim is read from the token's payload without verifying
+    its signature. Returns None if the token has no readable expiry.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json_loads(base64.urlsafe_b64decode(payload))
+        return claims["exp"] - 30
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def token_cache_path(host: str, username: str) -> Path:
+    """The file that a user's token for a host is cached in."""
+    key = hashlib.sha256(f"{host}\n{username}".encode("utf8")).hexdigest()
+    return TOKEN_CACHE_DIR / f"{key}.json"
+
+
+def password_digest(password: str, salt: bytes) -> str:
+    """A salted, slow hash of a password used to check that a cached
+    token was obtained with the same password."""
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf8"), salt, TOKEN_CACHE_ITERATIONS
+    ).hex()
+
+
+def load_cached_token(
+    host: str, username: str, password: str
+) -> typing.Tuple[str, float]:
+    """Load a user's token that was saved by a previous connection.
+
+    A token is only reused if it was obtained with the same password so
+    that wrong or changed credentials still go through a login.
+
+    Returns:
+        The token and its expiry or (None, None) if there is no
+        unexpired token cached for these credentials.
+    """
+    try:
+        with open(token_cache_path(host, username), "rb") as f:
+            cached = json_loads(f.read())
+
+        salt = bytes.fromhex(cached["salt"])
+        if time.time() < cached["expiry"] and hmac.compare_digest(
+            cached["password_digest"], password_digest(password, salt)
+        ):
+            return cached["token"], cached["expiry"]
+    except (AttributeError, OSError, KeyError, TypeError, ValueError):
+        pass
+
+    return None, None
+
+
+def save_cached_token(
+    host: str, username: str, password: str, token: str, expiry: float
+):
+    """Save a user's token so that later connections can skip logging in.
+
+    The file is only readable by the current user. It's written to a
+    temporary file that then replaces the cached one so that other
+    processes never read a partially written token.
+    """
+    salt = os.urandom(16)
+    cached = {
+        "token": token,
+        "expiry": expiry,
+        "salt": salt.hex(),
+        "password_digest": password_digest(password, salt),
+    }
+
+    try:
+        TOKEN_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkstemp creates the file with 0600 permissions
+        fd, tmp_path = tempfile.mkstemp(dir=TOKEN_CACHE_DIR, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json_dumps(cached))
+
+            os.replace(tmp_path, token_cache_path(host, username))
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+    except OSError as err:
+        logger.warning("Unable to cache token: %s", err)
+
+
+def tags_to_dict(tags):
+    """Map each tag type (e.g. 'datatype') to its value.
+
+    If a type occurs more than once, the first value is used.
     """
-    for tag in kwargs:
-        current_tags = [t for t in current_tags if not t["name"].startwith(f"{tag}:")]
-        current_tags += [{"name": f"{tag}:{kwargs[tag]}"}]
+    values = {}
+    for tag in tags:
+        tag_type, sep, value = tag["name"].partition(":")
+        if sep:
+            values.setdefault(tag_type, value)
 
-    return current_tags
+    return values
 
 
 def tags_to_datatype(tags):
@@ -75,6 +267,46 @@ def tags_to_datatype(tags):
     return None
 
 
+def file_md5(filepath: str, chunk_size: int = 4 * 1024 * 1024) -> str:
+    """Compute the MD5 hex digest of a file without reading it all at once."""
+    md5 = hashlib.md5()
+
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+
+def has_same_content(dataset, filepath: str) -> bool:
+    """Check whether a local file has the same contents as a dataset.
+
+    This is only possible if the server reports the dataset's `md5`.
+    If it doesn't, the file is assumed to be different.
+    """
+    md5 = dataset.data.get("md5")
+    return md5 is not None and md5 == file_md5(filepath)
+
+
+def metadata_matches(dataset, metadata: typing.Dict[str, typing.Any]) -> bool:
+    """Check whether updating a dataset with this metadata would change
+    its name or tags."""
+    if "name" in metadata and metadata["name"] != dataset.name:
+        return False
+
+    return {t["name"] for t in metadata.get("tags", dataset.tags)} == {
+        t["name"] for t in dataset.tags
+    }
+
+
+def ds_filename(dataset, full_path: bool = False) -> str:
+    """Return just the filename of a dataset."""
+    if full_path:
+        return dataset.datafile
+
+    return dataset.filename
+
+
 class InvalidCredentialsException(Exception):
     """Raised when invalid credentials are passed in."""
 
@@ -92,15 +324,32 @@ class UnknownConnectionException(Exception):
         )
 
 
+class DownloadProgressUnavailableException(UnknownConnectionException):
+    """Raised when a tileset exists but no download progress has been
+    recorded for it yet (e.g. because its download is still queued)."""
+
+    pass
+
+
+class TooManyDatasetsException(ValueError):
+    """Raised when a search matches more datasets than were requested."""
+
+    pass
+
+
 class GeneAnnotation:
+    __slots__ = ("name", "tx_start", "tx_end", "chrom")
+
     def __init__(self, gene_info):
         self.name = gene_info["geneName"]
-        self.tx_start = gene_info["txStart"]
-        self.tx_end = gene_info["txEnd"]
+        self.tx_start = int(gene_info["txStart"])
+        self.tx_end = int(gene_info["txEnd"])
         self.chrom = gene_info["chr"]
 
 
 class ChromosomeInfo:
+    __slots__ = ("total_length", "cum_chrom_lengths", "chrom_lengths", "chrom_order")
+
     def __init__(self):
         self.total_length = 0
         self.cum_chrom_lengths = {}
@@ -131,20 +380,95 @@ class ChromosomeInfo:
     def to_gene_range(self, gene, padding: float = 0) -> typing.Tuple[int, int]:
         return self.to_abs_range(gene.chrom, gene.tx_start, gene.tx_end, padding)
 
+    def to_abs_ranges(
+        self,
+        chroms: typing.Sequence[str],
+        starts: typing.Sequence[int],
+        ends: typing.Sequence[int],
+        padding: float = 0,
+        padding_abs: float = 0,
+    ) -> "np.ndarray":
+        """Calculate many padded ranges at once.
+
+        Returns:
+            An (n, 2) array with the absolute start and end of each range
+        """
+        import numpy as np
+
+        offsets = np.fromiter(
+            map(self.cum_chrom_lengths.__getitem__, chroms),
+            dtype=np.int64,
+            count=len(chroms),
+        )
+        starts = np.asarray(starts)
+        ends = np.asarray(ends)
+        padding_abs = padding_abs + (ends - starts) * padding
+
+        return np.column_stack(
+            [offsets + starts - padding_abs, offsets + ends + padding_abs]
+        )
+
+    def to_gene_ranges(self, genes, padding: float = 0) -> "np.ndarray":
+        """Calculate the ranges of several genes at once.
+
+        Returns:
+            An (n, 2) array with the absolute start and end of each gene
+        """
+        import numpy as np
+
+        return self.to_abs_ranges(
+            [gene.chrom for gene in genes],
+            np.fromiter((gene.tx_start for gene in genes), np.int64, len(genes)),
+            np.fromiter((gene.tx_end for gene in genes), np.int64, len(genes)),
+            padding,
+        )
+
 
 def get_chrominfo_from_string(chromsizes_str):
-    chrom_info = ChromosomeInfo()
-    total_length = 0
+    """Parse the contents of a chromsizes file.
+
+    Each line should contain a chromosome name and its length.
+    """
+    return get_chrominfo_from_lines(chromsizes_str.splitlines())
+
+
+def get_chrominfo_from_lines(lines: typing.Iterable[str]):
+    """Parse the lines of a chromsizes file in a single pass.
 
-    for line in chromsizes_str.strip("\n").split("\n"):
+    Blank lines are only allowed at the start and the end.
+    """
+    names = []
+    lengths = []
+    blank = False
+
+    for line in lines:
         rec = line.split()
-        total_length += int(rec[1])
+        if not rec:
+            blank = bool(names)
+            continue
+
+        if blank or len(rec) < 2:
+            raise ValueError(f"Invalid chromsizes line: {line!r}")
+
+        names.append(rec[0])
+        lengths.append(rec[1])
+
+    return chrominfo_from_sizes(names, lengths)
+
 
-        chrom_info.cum_chrom_lengths[rec[0]] = total_length - int(rec[1])
-        chrom_info.chrom_lengths[rec[0]] = int(rec[1])
-        chrom_info.chrom_order += [rec[0]]
+def chrominfo_from_sizes(names: typing.List[str], lengths: typing.Sequence):
+    """Create a ChromosomeInfo from ordered chromosome names and lengths."""
+    import numpy as np
+
+    lengths = np.array(lengths, dtype=np.int64)
+    ends = np.cumsum(lengths)
+
+    chrom_info = ChromosomeInfo()
+    chrom_info.cum_chrom_lengths = dict(zip(names, (ends - lengths).tolist()))
+    chrom_info.chrom_lengths = dict(zip(names, lengths.tolist()))
+    chrom_info.chrom_order = names
+    chrom_info.total_length = int(ends[-1]) if len(ends) else 0
 
-    chrom_info.total_length = total_length
     return chrom_info
 
 
@@ -152,12 +476,31 @@ class ResgenDataset:
     """Encapsulation of a resgen dataset. Typically initialized
     from the return of a dataset search or sync on the server."""
 
+    __slots__ = (
+        "conn",
+        "data",
+        "datafile",
+        "filename",
+        "uuid",
+        "tags",
+        "name",
+        "datatype",
+        "filetype",
+        "assembly",
+    )
+
     def __init__(self, conn, data):
         """Initialize with data returned from the tileset server."""
+        self.conn = conn
+        self.set_data(data)
+
+    def set_data(self, data):
+        """Set this dataset's properties from data returned by the server."""
         self.data = data
 
-        self.conn = conn
         self.datafile = data["datafile"]
+        # split once since datasets are repeatedly matched by filename
+        self.filename = op.basename(self.datafile)
         self.uuid = data["uuid"]
         self.tags = []
         if "tags" in data:
@@ -167,6 +510,12 @@ class ResgenDataset:
         if "name" in data:
             self.name = data["name"]
 
+        # scan the tags once rather than every time one is needed
+        tag_values = tags_to_dict(self.tags)
+        self.datatype = tag_values.get("datatype")
+        self.filetype = tag_values.get("filetype")
+        self.assembly = tag_values.get("assembly")
+
     def __str__(self):
         """String representation."""
         return f"{self.uuid[:8]}: {self.name}"
@@ -177,24 +526,31 @@ class ResgenDataset:
 
     def update(self, **kwargs):
         """Update this datasets metadata."""
-        return self.conn.update_dataset(self.uuid, kwargs)
+        updated = self.conn.update_dataset(self.uuid, kwargs)
+        self.set_data(updated.data)
+
+        return updated
 
     def download_link(self):
         """Get a download link for this dataset."""
         ret = self.conn.authenticated_request(
-            requests.get, f"{self.conn.host}/download/?d={self.uuid}"
+            self.conn.session.get,
+            self.conn.urls["download"],
+            params={"d": self.uuid},
+            expected_status=200,
+            error_message="Failed to get download link",
         )
 
-        if ret.status_code != 200:
-            return UnknownConnectionException("Failed to get download link", ret)
-
-        return ret.json()
+        return json_loads(ret.content)
 
     def hg_track(
         self, track_type=None, position=None, height=None, width=None, **options
     ):
         """Create a higlass track from this dataset."""
-        datatype = tags_to_datatype(self.tags)
+        import higlass.client as hgc
+        from higlass import Track
+
+        datatype = self.datatype
 
         if track_type is None:
             track_type, suggested_position = hgc.datatype_to_tracktype(datatype)
@@ -217,43 +573,178 @@ class ResgenDataset:
             height=height,
             width=width,
             tileset_uuid=self.uuid,
-            server=f"{self.conn.host}/api/v1",
+            server=self.conn.urls["api"],
             options=options,
         )
 
 
+def create_session() -> requests.Session:
+    """Create a session with pooled connections that retries requests
+    which failed because of temporary server errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 502, 503, 504],
+            # return the last response rather than raising so that
+            # it can be reported as an UnknownConnectionException
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
 class ResgenConnection:
     """Connection to the resgen server."""
 
-    def __init__(self, username, password, host=RESGEN_HOST, bucket=RESGEN_BUCKET):
+    def __init__(
+        self,
+        username,
+        password,
+        host=RESGEN_HOST,
+        bucket=RESGEN_BUCKET,
+        http2: bool = False,
+        cache_token: bool = True,
+    ):
+        """Log in to the resgen server.
+
+        Args:
+            http2: Send requests over HTTP/2 using httpx (which needs to
+                be installed) rather than requests
+            cache_token: Reuse a token saved in ~/.resgen/token_cache by a
+                previous connection and save new tokens there
+        """
         self.username = username
         self.password = password
         self.host = host
         self.bucket = bucket
 
-        self.token = None
+        # endpoint urls are built once rather than on every request
+        api = f"{host}/api/v1"
+        self.urls = {
+            "api": api,
+            "download": f"{host}/download/",
+            "projects": f"{api}/projects/",
+            "tilesets": f"{api}/tilesets/",
+            "tileset": f"{api}/tilesets/{{}}/",
+            "list_tilesets": f"{api}/list_tilesets/",
+            "suggest": f"{api}/suggest/",
+            "chrom_sizes": f"{api}/chrom-sizes/",
+            "download_progress": f"{api}/download_progress/",
+            "prepare_file_upload": f"{api}/prepare_file_upload/",
+            "finish_file_upload": f"{api}/finish_file_upload/",
+            "viewconfs": f"{api}/viewconfs/",
+            "viewconf": f"{api}/viewconfs/{{}}/",
+            "list_viewconfs": f"{api}/list_viewconfs/",
+        }
+
+        # a single session lets consecutive requests to the same host
+        # reuse pooled keep-alive connections
+        if http2:
+            from resgen.http2 import HttpxSession
+
+            self.session = HttpxSession()
+        else:
+            self.session = create_session()
+
+        # used for requests to other hosts (e.g. track hubs) so that
+        # they never receive the authorization header
+        self.anonymous_session = create_session()
+
+        # project uuids keyed by (gruser, project name) and recently
+        # retrieved dataset data keyed by uuid
+        self.project_cache = {}
+        self.dataset_cache = {}
+
+        self.cache_token = cache_token
+        self.token, self.token_expiry = None, None
+        if cache_token:
+            self._set_token(*load_cached_token(host, username, password))
+        self.token_lock = threading.Lock()
         self.token = self.get_token()
 
-    def authenticated_request(self, func, *args, **kwargs):
-        """Send post request"""
+    def close(self):
+        """Close the pooled connections held by this connection's sessions."""
+        self.session.close()
+        self.anonymous_session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def invalidate_cache(self):
+        """Forget all cached projects and datasets."""
+        self.project_cache = {}
+        self.dataset_cache = {}
+
+    def authenticated_request(
+        self, func, *args, expected_status=None, error_message=None, **kwargs
+    ):
+        """Send a request using the session's authorization header.
+
+        If the server rejects the token, log in again and retry once.
+
+        Args:
+            func: The session method to use (e.g. `self.session.get`)
+            expected_status: If provided, raise an UnknownConnectionException
+                with `error_message` if the response has a different status
+        """
         token = self.get_token()
+        kwargs = {"timeout": REQUEST_TIMEOUT, **kwargs}
+
+        ret = func(*args, **kwargs)
 
-        return func(
-            *args, **{**kwargs, "headers": {"Authorization": "Bearer {}".format(token)}}
+        if ret.status_code == 401:
+            # release the connection (streamed responses hold on to it)
+            ret.close()
+            self.get_token(rejected_token=token)
+            ret = func(*args, **kwargs)
+
+        if expected_status is not None and ret.status_code != expected_status:
+            raise UnknownConnectionException(error_message, ret)
+
+        return ret
+
+    def has_valid_token(self, rejected_token: str = None) -> bool:
+        """Check whether the current token can still be used without
+        contacting the server."""
+        return (
+            self.token is not None
+            and self.token != rejected_token
+            and (self.token_expiry is None or time.time() < self.token_expiry)
         )
 
-    def get_token(self) -> str:
-        """Get a JWT token for interacting with the service."""
-        if self.token:
-            ret = requests.get(
-                f"{self.host}/api/v1/which_user/",
-                headers={"Authorization": "Bearer {}".format(self.token)},
-            )
+    def get_token(self, rejected_token: str = None) -> str:
+        """Get a JWT token for interacting with the service.
+
+        A previously obtained token is reused until shortly before
+        it expires.
 
-            if ret.status_code == 200:
+        Args:
+            rejected_token: A token that the server didn't accept. If it's
+                still the current token, log in again.
+        """
+        if self.has_valid_token(rejected_token):
+            return self.token
+
+        # only one thread should log in when the token needs replacing
+        with self.token_lock:
+            if self.has_valid_token(rejected_token):
                 return self.token
 
-        ret = requests.post(
+            return self.login()
+
+    def login(self) -> str:
+        """Get a new token using the connection's username and password."""
+        ret = self.session.post(
             f"{RESGEN_AUTH0_DOMAIN}/oauth/token/",
             data={
                 "username": self.username,
@@ -261,6 +752,9 @@ class ResgenConnection:
                 "grant_type": "password",
                 "client_id": RESGEN_AUTH0_CLIENT_ID,
             },
+            # don't send a stale token along with the login request
+            headers={"Authorization": None},
+            timeout=REQUEST_TIMEOUT,
         )
 
         if ret.status_code == 400:
@@ -270,22 +764,47 @@ class ResgenConnection:
         elif ret.status_code != 200:
             raise UnknownConnectionException("Failed to login", ret)
 
-        data = json.loads(ret.content.decode("utf8"))
-        self.token = data["access_token"]
+        data = json_loads(ret.content)
+        token = data["access_token"]
+        self._set_token(token, token_expiry(token))
+
+        if self.cache_token and self.token_expiry is not None:
+            save_cached_token(
+                self.host, self.username, self.password, self.token, self.token_expiry
+            )
         return self.token
 
+    def _set_token(self, token: str, expiry: typing.Optional[float]):
+        """Use a new token for all subsequent requests.
+
+        The authorization header is only built here so that sending a
+        request doesn't need to construct it.
+        """
+        self.token, self.token_expiry = token, expiry
+
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
     def find_project(self, project_name: str, group: str = None):
-        """Find a project."""
+        """Find a project.
+
+        Projects that have been found before are returned without
+        contacting the server.
+        """
         name = group if group else self.username
 
+        if (name, project_name) in self.project_cache:
+            return ResgenProject(self.project_cache[(name, project_name)], self)
+
         ret = self.authenticated_request(
-            requests.get, f"{self.host}/api/v1/projects/?n={name}&pn={project_name}"
+            self.session.get,
+            self.urls["projects"],
+            params={"n": name, "pn": project_name},
+            expected_status=200,
+            error_message="Failed to fetch projects",
         )
 
-        if ret.status_code != 200:
-            return UnknownConnectionException("Failed to fetch projects", ret)
-
-        content = json.loads(ret.content)
+        content = json_loads(ret.content)
 
         if content["count"] == 0:
             raise Exception("Project not found")
@@ -293,7 +812,10 @@ class ResgenConnection:
         if content["count"] > 1:
             raise Exception("More than one project found:", json.dumps(content))
 
-        return ResgenProject(content["results"][0]["uuid"], self)
+        uuid = content["results"][0]["uuid"]
+        self.project_cache[(name, project_name)] = uuid
+
+        return ResgenProject(uuid, self)
 
     def find_or_create_project(
         self, project_name: str, group: str = None, private: bool = True
@@ -308,25 +830,38 @@ class ResgenConnection:
             project_name: The name of the project to create.
             private: Whether to make this a private project.
         """
+        # the group is left out of the query (and the key) if it's not given
+        if (group, project_name) in self.project_cache:
+            return ResgenProject(self.project_cache[(group, project_name)], self)
 
-        url = f"{self.host}/api/v1/projects/?pn={project_name}"
+        params = {"pn": project_name}
 
         if group:
-            url += f"&n={group}"
-        ret = self.authenticated_request(requests.get, url)
+            params["n"] = group
+        ret = self.authenticated_request(
+            self.session.get, self.urls["projects"], params=params
+        )
+
+        if ret.status_code != 404:
+            content = json_loads(ret.content)
 
-        if ret.status_code == 404 or ret.json()["count"] == 0:
-            url = f"{self.host}/api/v1/projects/"
+        if ret.status_code == 404 or content["count"] == 0:
             data = {"name": project_name, "private": private, "tilesets": []}
             if group:
                 data = {**data, "gruser": group}
 
-            ret = self.authenticated_request(requests.post, url, json=data)
-            if ret.status_code == 409 or ret.status_code == 201:
-                return ResgenProject(ret.json()["uuid"], self)
-            raise UnknownConnectionException("Failed to create project", ret)
+            ret = self.authenticated_request(
+                self.session.post, self.urls["projects"], json=data
+            )
+            if ret.status_code != 409 and ret.status_code != 201:
+                raise UnknownConnectionException("Failed to create project", ret)
+
+            uuid = json_loads(ret.content)["uuid"]
+        else:
+            uuid = content["results"][0]["uuid"]
 
-        return ResgenProject(ret.json()["results"][0]["uuid"], self)
+        self.project_cache[(group, project_name)] = uuid
+        return ResgenProject(uuid, self)
 
     def list_projects(self, gruser: str = None):
         """List the projects of the connected user or the specified group.
@@ -339,73 +874,155 @@ class ResgenConnection:
 
         # don't paginate because user's shouldn't have obscene numbers of
         # projects
-        url = f"{self.host}/api/v1/projects/?n={gruser}&limit={MAX_LIMIT}"
-        ret = self.authenticated_request(requests.get, url)
-
-        if ret.status_code != 200:
-            return UnknownConnectionException("Failed to retrieve projects", ret)
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["projects"],
+            params={"n": gruser, "limit": MAX_LIMIT},
+            expected_status=200,
+            error_message="Failed to retrieve projects",
+        )
 
-        retj = json.loads(ret.content)
+        retj = json_loads(ret.content)
         return [
             ResgenProject(proj["uuid"], self, proj["name"]) for proj in retj["results"]
         ]
 
     def get_dataset(self, uuid):
-        """Retrieve a dataset."""
-        url = f"{self.host}/api/v1/tilesets/{uuid}/"
+        """Retrieve a dataset.
 
-        ret = self.authenticated_request(requests.get, url)
+        Datasets retrieved less than DATASET_CACHE_TTL seconds ago are
+        returned from the cache.
+        """
+        if uuid in self.dataset_cache:
+            retrieved, data = self.dataset_cache[uuid]
 
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Unable to get dataset", ret)
+            if time.time() - retrieved < DATASET_CACHE_TTL:
+                return ResgenDataset(self, data)
 
-        return ResgenDataset(self, json.loads(ret.content))
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["tileset"].format(uuid),
+            expected_status=200,
+            error_message="Unable to get dataset",
+        )
+
+        data = json_loads(ret.content)
+        self.dataset_cache[uuid] = (time.time(), data)
+
+        return ResgenDataset(self, data)
 
     def find_datasets(
-        self, search_string="", project=None, limit=1000, datafile=None, **kwargs
+        self, search_string="", project=None, limit=None, datafile=None, **kwargs
     ):
-        """Search for datasets."""
-        tags_line = "&".join(
-            [
-                f"t={k}:{v}"
-                for k, v in kwargs.items()
-                if k not in ["search_string", "project", "limit"]
-            ]
-        )
+        """Search for datasets.
 
-        url = f"{self.host}/api/v1/list_tilesets/?limit={limit}&{tags_line}"
+        Any extra keyword arguments are used as tags to filter by (e.g.
+        `datatype="matrix"`).
 
-        if project:
-            url += f"&ui={project.uuid}"
-        if datafile:
-            url += f"&df={datafile}"
+        Args:
+            limit: The maximum number of datasets to return. Defaults to 2
+                when searching for a datafile, which should only have one
+                match, and to 1000 otherwise.
+        """
+        if limit is None:
+            limit = 2 if datafile else 1000
 
-        url += f"&ac={search_string}&limit={limit}"
-        ret = self.authenticated_request(requests.get, url)
+        params = [("limit", limit)]
+        params += self._dataset_query(search_string, project, datafile, **kwargs)
+        content = self._list_tilesets(params)
 
-        print("url:", url)
-        if ret.status_code == 200:
-            content = json.loads(ret.content)
+        if content["count"] > limit:
+            raise TooManyDatasetsException(
+                f"More datasets available ({content['count']}) than returned ({limit}))"
+            )
 
-            if content["count"] > limit:
-                raise ValueError(
-                    f"More datasets available ({content['count']}) than returned ({limit}))"
-                )
+        return [ResgenDataset(self, c) for c in content["results"]]
 
-            return [ResgenDataset(self, c) for c in content["results"]]
+    def iter_datasets(
+        self,
+        search_string="",
+        project=None,
+        datafile=None,
+        page_size: int = DATASET_PAGE_SIZE,
+        limit: int = None,
+        **kwargs,
+    ) -> typing.Iterator[ResgenDataset]:
+        """Lazily iterate over the datasets matching a search.
+
+        Unlike `find_datasets`, there is no need to know the number of
+        results in advance. They are requested a page at a time so that
+        the server never has to serialize every dataset in one response,
+        and the next page is fetched while the current one is consumed.
 
-        raise UnknownConnectionException("Failed to retrieve tilesets", ret)
+        Args:
+            page_size: The number of datasets to request at a time
+            limit: Stop after this many datasets. No more pages than are
+                needed to reach it are requested.
+        """
+        query = self._dataset_query(search_string, project, datafile, **kwargs)
 
-    def get_genes(self, annotations_ds, gene_name):
-        """Retreive gene information by searching by gene name."""
-        url = f"{self.host}/api/v1/suggest/?d={annotations_ds.uuid}&ac={gene_name}"
+        def fetch_page(offset):
+            params = [("limit", page_size), ("offset", offset)] + query
+            return self._list_tilesets(params)
 
-        ret = self.authenticated_request(requests.get, url)
+        offset = 0
 
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Failed to retrieve genes", ret)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = executor.submit(fetch_page, offset)
+
+            while page is not None:
+                content = page.result()
+                results = content["results"]
+                if limit is not None:
+                    results = results[: limit - offset]
+                offset += len(results)
+
+                total = content["count"]
+                if limit is not None:
+                    total = min(total, limit)
+
+                page = None
+                if results and offset < total:
+                    page = executor.submit(fetch_page, offset)
+
+                for c in results:
+                    yield ResgenDataset(self, c)
 
-        suggestions = json.loads(ret.content)
+    def _dataset_query(self, search_string, project, datafile, **kwargs):
+        """Build the query parameters shared by the dataset searches."""
+        # a list of pairs so that several tags can be passed
+        params = [("ac", search_string)]
+        params += [("t", f"{k}:{v}") for k, v in kwargs.items()]
+
+        if project:
+            params += [("ui", project.uuid)]
+        if datafile:
+            params += [("df", datafile)]
+
+        return params
+
+    def _list_tilesets(self, params):
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["list_tilesets"],
+            params=params,
+            expected_status=200,
+            error_message="Failed to retrieve tilesets",
+        )
+
+        return json_loads(ret.content)
+
+    def get_genes(self, annotations_ds, gene_name):
+        """Retreive gene information by searching by gene name."""
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["suggest"],
+            params={"d": annotations_ds.uuid, "ac": gene_name},
+            expected_status=200,
+            error_message="Failed to retrieve genes",
+        )
+
+        suggestions = json_loads(ret.content)
         return suggestions
 
     def get_gene(self, annotations_ds, gene_name):
@@ -423,26 +1040,53 @@ class ResgenConnection:
 
     def get_chrominfo(self, chrominfo_ds):
         """Retrieve chromosome information from a chromsizes dataset."""
-        url = f"{self.host}/api/v1/chrom-sizes/?id={chrominfo_ds.uuid}"
-        ret = self.authenticated_request(requests.get, url)
-
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Failed to retrieve chrominfo", ret)
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["chrom_sizes"],
+            params={"id": chrominfo_ds.uuid},
+            expected_status=200,
+            error_message="Failed to retrieve chrominfo",
+        )
 
+        # chromsizes files are small so they're read in one go. streaming
+        # them can split crlf pairs into spurious blank lines
         return get_chrominfo_from_string(ret.content.decode("utf8"))
 
-    def download_progress(self, tileset_uuid):
+    def download_progress(self, tileset_uuid, wait_ms: int = None):
         """Get the download progress for a tileset.
 
-        Raise an exception if there's no recorded tileset
-        progress for this uuid."""
-        url = f"{self.host}/api/v1/download_progress/?d={tileset_uuid}"
+        Raise a DownloadProgressUnavailableException if the tileset
+        exists but there's no recorded progress for it yet.
+
+        Args:
+            tileset_uuid: The uuid of the tileset being downloaded
+            wait_ms: Ask servers that support long-polling to wait up to
+                this long for the progress to change before responding
+        """
+        params = {"d": tileset_uuid}
+        headers = {}
+
+        if wait_ms:
+            params["wait_ms"] = wait_ms
+            # the standard (RFC 7240) way of asking for a long-poll
+            headers["Prefer"] = f"wait={wait_ms // 1000}"
 
-        ret = self.authenticated_request(requests.get, url)
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["download_progress"],
+            params=params,
+            headers=headers,
+        )
+
+        if ret.status_code >= 500:
+            raise UnknownConnectionException(
+                "Failed to retrieve download progress", ret
+            )
 
         if ret.status_code != 200:
-            url = f"{self.host}/api/v1/tilesets/{tileset_uuid}/"
-            ret = self.authenticated_request(requests.get, url)
+            ret = self.authenticated_request(
+                self.session.get, self.urls["tileset"].format(tileset_uuid)
+            )
 
             if ret.status_code != 200:
                 logger.error("Download failed")
@@ -451,14 +1095,53 @@ class ResgenConnection:
                     + "make sure it exists at the given URL"
                 )
             else:
-                raise UnknownConnectionException(
-                    "Failed to retrieve download progress", ret
+                raise DownloadProgressUnavailableException(
+                    "No download progress recorded yet", ret
                 )
 
-        return json.loads(ret.content)
+        return json_loads(ret.content)
+
+    def stream_download_progress(self, tileset_uuid):
+        """Yield download progress updates pushed by the server.
+
+        The updates are read as server-sent events from a single
+        connection. Nothing is yielded if the server doesn't support
+        streaming progress, in which case `download_progress` should be
+        polled instead.
+        """
+        try:
+            ret = self.authenticated_request(
+                self.session.get,
+                self.urls["download_progress"],
+                params={"d": tileset_uuid},
+                headers={"Accept": "text/event-stream"},
+                stream=True,
+            )
+        except requests.RequestException:
+            return
+
+        try:
+            content_type = ret.headers.get("Content-Type", "")
+            if ret.status_code != 200 or not content_type.startswith(
+                "text/event-stream"
+            ):
+                return
+
+            for line in ret.iter_lines(decode_unicode=True):
+                if line.startswith("data:"):
+                    yield json_loads(line[5:])
+        except requests.RequestException:
+            # the caller falls back to polling if the stream breaks
+            return
+        finally:
+            ret.close()
 
     def upload_to_resgen_aws(
-        self, filepath: str, prefix: str = None, index_filepath=None
+        self,
+        filepath: str,
+        prefix: str = None,
+        index_filepath=None,
+        transfer_config=None,
     ) -> str:
         """
         Upload file to a resgen aws bucket.
@@ -466,22 +1149,34 @@ class ResgenConnection:
         Args:
             filepath: The local filepath
             prefix: A prefix to upload to on the S3 bucket
+            index_filepath: The local filepath of an index file to upload
+                along with the data file
+            transfer_config: A boto3 TransferConfig controlling the part
+                size and concurrency of multipart uploads. Defaults to
+                `aws.TRANSFER_CONFIG`.
 
         Returns:
-            The path within the bucket where the object is uploaded
+            The paths within the bucket where the data and index files are
+            uploaded or (None, None) if either upload failed
 
         """
-        logger.info("Getting upload credentials for file: %s", filepath)
-        url = f"{self.host}/api/v1/prepare_file_upload/"
-        if prefix:
-            url = f"{url}/?d={prefix}"
-        ret = self.authenticated_request(requests.get, url)
+        from resgen import aws
 
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Failed to prepare file upload", ret)
+        if transfer_config is None:
+            transfer_config = aws.TRANSFER_CONFIG
+
+        logger.info("Getting upload credentials for file: %s", filepath)
+        params = {"d": prefix} if prefix else None
+        ret = self.authenticated_request(
+            self.session.get,
+            self.urls["prepare_file_upload"],
+            params=params,
+            expected_status=200,
+            error_message="Failed to prepare file upload",
+        )
 
-        content = json.loads(ret.content)
-        filename = op.split(filepath)[1]
+        content = json_loads(ret.content)
+        filename = op.basename(filepath)
 
         directory_path = f"{content['fileDirectory']}/{filename}"
         object_name = f"{content['uploadBucketPrefix']}/{filename}"
@@ -489,18 +1184,26 @@ class ResgenConnection:
         logger.info("Uploading to aws object: %s", object_name)
         index_directory_path = None
         if index_filepath:
-            index_filename = op.split(index_filepath)[1]
+            index_filename = op.basename(index_filepath)
             index_object_name = f"{content['uploadBucketPrefix']}/{index_filename}"
             index_directory_path = f"{content['fileDirectory']}/{index_filename}"
             logger.info("Uploading to aws index object: %s", index_object_name)
 
         bucket = self.bucket
-        if aws.upload_file(filepath, bucket, content, object_name):
-            if index_filepath:
-                if not aws.upload_file(
-                    index_filepath, bucket, content, index_object_name
-                ):
-                    return None
+        to_upload = [(filepath, object_name)]
+        if index_filepath:
+            to_upload += [(index_filepath, index_object_name)]
+
+        # upload the data and index files at the same time
+        with ThreadPoolExecutor(max_workers=len(to_upload)) as executor:
+            futures = [
+                executor.submit(
+                    aws.upload_file, path, bucket, content, name, transfer_config
+                )
+                for path, name in to_upload
+            ]
+
+        if all(future.result() for future in futures):
             return (directory_path, index_directory_path)
 
         return (None, None)
@@ -509,7 +1212,6 @@ class ResgenConnection:
         self, uuid: str, metadata: typing.Dict[str, typing.Any]
     ) -> ResgenDataset:
         """Update the properties of a dataset."""
-        new_metadata = {}
         updatable_properties = ["name", "datafile", "tags", "description"]
 
         for key in metadata:
@@ -518,22 +1220,17 @@ class ResgenConnection:
                     f"Received property that can not be udpated: {key} "
                     f"Updatable properties: {str(updatable_properties)}"
                 )
-        if "name" in metadata:
-            new_metadata["name"] = metadata["name"]
-        if "description" in metadata:
-            new_metadata["description"] = metadata["description"]
-        if "datafile" in metadata:
-            new_metadata["datafile"] = metadata["datafile"]
-        if "tags" in metadata:
-            new_metadata["tags"] = metadata["tags"]
 
-        ret = self.authenticated_request(
-            requests.patch, f"{self.host}/api/v1/tilesets/{uuid}/", json=new_metadata
+        # every key has been checked so the metadata can be sent as is
+        self.authenticated_request(
+            self.session.patch,
+            self.urls["tileset"].format(uuid),
+            json=metadata,
+            expected_status=202,
+            error_message="Failed to update dataset",
         )
 
-        if ret.status_code != 202:
-            raise UnknownConnectionException("Failed to update dataset", ret)
-
+        self.dataset_cache.pop(uuid, None)
         return self.get_dataset(uuid)
 
 
@@ -555,14 +1252,43 @@ class ResgenProject:
         self.conn = conn
         self.name = name
 
-    def list_datasets(self, limit: int = 1000):
+    def list_datasets(self, limit: int = 1000, filename: str = None):
         """List the datasets available in this project.
 
-        Returns up to a limit
+        Returns up to a limit. Only as many pages as are needed to reach
+        the limit are requested.
+
+        Args:
+            limit: The maximum number of datasets to return
+            filename: Only list datasets whose datafile matches this
+                filename. The filtering is done by the server.
+        """
+        datasets = self.conn.iter_datasets(
+            project=self,
+            datafile=filename,
+            page_size=min(limit, DATASET_PAGE_SIZE),
+            limit=limit,
+        )
+        return list(datasets)
+
+    def datasets_by_filename(self, sync_full_path: bool = False):
+        """Fetch all of this project's datasets.
+
+        Args:
+            sync_full_path: Key datasets by their full datafile rather
+                than just the filename.
+
+        Returns:
+            A dictionary of filename -> list of datasets with that filename
         """
-        return self.conn.find_datasets(project=self)
+        datasets = {}
+
+        for dataset in self.conn.iter_datasets(project=self):
+            datasets.setdefault(ds_filename(dataset, sync_full_path), []).append(
+                dataset
+            )
 
-        # raise NotImplementedError()
+        return datasets
 
     def add_link_dataset(self, filepath: str, index_filepath: str = None):
         """Add a remote dataset
@@ -588,17 +1314,24 @@ class ResgenProject:
             body["indexfile"] = index_filepath
 
         ret = self.conn.authenticated_request(
-            requests.post, f"{self.conn.host}/api/v1/tilesets/", json=body,
+            self.conn.session.post, self.conn.urls["tilesets"], json=body,
         )
-        content = json.loads(ret.content)
+        content = json_loads(ret.content)
         return content["uuid"]
 
-    def add_download_dataset(self, filepath: str, index_filepath: str = None):
+    def add_download_dataset(
+        self, filepath: str, index_filepath: str = None, wait_ms: int = None
+    ):
         """Add a dataset by downloading it from a remote source
 
+        Progress is streamed from the server if it supports it and is
+        polled otherwise.
+
         Args:
             filepath: The filename of the dataset to add. Can also be a url.
             index_filepath: The filename of the index for this dataset
+            wait_ms: Passed on to `download_progress` for servers that
+                support long-polling
 
         Returns:
             The uuid of the newly created dataset.
@@ -618,7 +1351,7 @@ class ResgenProject:
             body["indexfile"] = index_filepath
 
         ret = self.conn.authenticated_request(
-            requests.post, f"{self.conn.host}/api/v1/tilesets/", json=body,
+            self.conn.session.post, self.conn.urls["tilesets"], json=body,
         )
 
         if ret.status_code != 201:
@@ -629,30 +1362,79 @@ class ResgenProject:
             )
             return
 
-        content = json.loads(ret.content)
+        content = json_loads(ret.content)
+        last_percent = None
+
+        for progress in self._download_progress_updates(content["uuid"], wait_ms):
+            if progress["filesize"] > 0:
+                transferred = progress["downloaded"] + progress["uploaded"]
+                to_transfer = 2 * progress["filesize"]
+                percent_done = 100 * transferred / to_transfer
+
+                # only redraw when the displayed percentage changes
+                if int(percent_done) != last_percent:
+                    last_percent = int(percent_done)
+                    sys.stdout.write(
+                        f"\r {percent_done:.3f}% Complete "
+                        f"({transferred} of {to_transfer})"
+                    )
+                    # updates are infrequent so make sure each one shows
+                    sys.stdout.flush()
+
+        if last_percent is not None:
+            sys.stdout.write("\n")
+
+        return content["uuid"]
+
+    def _download_progress_updates(self, tileset_uuid, wait_ms: int = None):
+        """Yield the progress of a download until it's complete.
 
+        Updates are streamed from the server if it supports it. Otherwise,
+        or if the stream ends early, progress is polled with an
+        exponentially increasing interval that is reset whenever the
+        transfer advances. Polling gives up after MAX_PROGRESS_FAILURES
+        consecutive connection or server errors. A download that hasn't
+        recorded any progress yet is waited for rather than counted as
+        a failure.
+        """
         progress = {"downloaded": 0, "uploaded": 0, "filesize": 1}
+
+        for progress in self.conn.stream_download_progress(tileset_uuid):
+            yield progress
+
+        attempt = 0
+        delay = 0
+        failures = 0
+
         while (
             progress["downloaded"] < progress["filesize"]
             or progress["uploaded"] < progress["filesize"]
             or progress["downloaded"] == 0
         ):
-            try:
-                progress = self.conn.download_progress(content["uuid"])
-            except UnknownConnectionException:
-                pass
-            time.sleep(0.5)
+            time.sleep(delay)
 
-            if progress["filesize"] > 0:
-                transferred = progress["downloaded"] + progress["uploaded"]
-                to_transfer = 2 * progress["filesize"]
-                percent_done = 100 * transferred / to_transfer
-
-                sys.stdout.write(
-                    f"\r {percent_done:.3f}% Complete ({transferred} of {to_transfer})"
-                )
+            transferred = progress["downloaded"] + progress["uploaded"]
+            try:
+                progress = self.conn.download_progress(tileset_uuid, wait_ms)
+                failures = 0
+            except DownloadProgressUnavailableException:
+                # the download is still queued
+                failures = 0
+            except (UnknownConnectionException, requests.RequestException):
+                # transient errors have already been retried by the session
+                failures += 1
+                if failures >= MAX_PROGRESS_FAILURES:
+                    raise
+
+            if progress["downloaded"] + progress["uploaded"] > transferred:
+                attempt = 0
+            else:
+                attempt += 1
+            delay = min(MAX_POLL_INTERVAL, POLL_INTERVAL * POLL_BACKOFF ** attempt)
+            # jitter so that many concurrent downloads don't poll in lockstep
+            delay *= random.uniform(1 - POLL_JITTER, 1)
 
-        return content["uuid"]
+            yield progress
 
     def add_upload_dataset(self, filepath: str, index_filepath: str = None):
         """Add a dataset by uploading it to resgen
@@ -685,13 +1467,14 @@ class ResgenProject:
             body["indexpath"] = index_directory_path
 
         ret = self.conn.authenticated_request(
-            requests.post, f"{self.conn.host}/api/v1/finish_file_upload/", json=body,
+            self.conn.session.post,
+            self.conn.urls["finish_file_upload"],
+            json=body,
+            expected_status=200,
+            error_message="Failed to finish uploading file",
         )
 
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Failed to finish uploading file", ret)
-
-        content = json.loads(ret.content)
+        content = json_loads(ret.content)
         return content["uuid"]
 
     def add_dataset(
@@ -711,26 +1494,28 @@ class ResgenProject:
 
     def delete_dataset(self, uuid: str):
         """Delete a dataset."""
-        ret = self.conn.authenticated_request(
-            requests.delete, f"{self.conn.host}/api/v1/tilesets/{uuid}/"
+        self.conn.authenticated_request(
+            self.conn.session.delete,
+            self.conn.urls["tileset"].format(uuid),
+            expected_status=204,
+            error_message="Failed to delete dataset",
         )
 
-        if ret.status_code != 204:
-            raise UnknownConnectionException("Failed to delete dataset", ret)
-
+        self.conn.dataset_cache.pop(uuid, None)
         return uuid
 
     def sync_viewconf(self, viewconf, name):
         """Create a viewconf if it doesn't exist and update it if it does."""
         # try to get a viewconf with that name
         ret = self.conn.authenticated_request(
-            requests.get, f"{self.conn.host}/api/v1/list_viewconfs/?n={name}"
+            self.conn.session.get,
+            self.conn.urls["list_viewconfs"],
+            params={"n": name},
+            expected_status=200,
+            error_message="Failed to retrieve viewconfs",
         )
 
-        if ret.status_code != 200:
-            raise UnknownConnectionException("Failed to retrieve viewconfs", ret)
-
-        content = json.loads(ret.content)
+        content = json_loads(ret.content)
 
         if content["count"] > 1:
             raise ValueError(
@@ -745,19 +1530,21 @@ class ResgenProject:
 
     def delete_viewconf(self, uuid):
         """Delete a viewconf."""
-        ret = self.conn.authenticated_request(
-            requests.delete, f"{self.conn.host}/api/v1/viewconfs/{uuid}/"
+        self.conn.authenticated_request(
+            self.conn.session.delete,
+            self.conn.urls["viewconf"].format(uuid),
+            expected_status=204,
+            error_message="Unable to delete viewconf:",
         )
 
-        if ret.status_code != 204:
-            raise UnknownConnectionException("Unable to delete viewconf:", ret)
-
     def add_viewconf(self, viewconf, name):
         """Save a viewconf to this project."""
+        import higlass.client as hgc
+
         if isinstance(viewconf, hgc.ViewConf):
             viewconf = viewconf.to_dict()
 
-        viewconf_str = json.dumps(viewconf)
+        viewconf_str = json_dumps(viewconf)
 
         post_data = {
             "viewconf": viewconf_str,
@@ -767,13 +1554,18 @@ class ResgenProject:
             "uid": slugid.nice(),
         }
 
-        ret = self.conn.authenticated_request(
-            requests.post, f"{self.conn.host}/api/v1/viewconfs/", json=post_data
+        # viewconfs can be large so serialize the body with the fast
+        # encoder rather than letting requests use the json module. it's
+        # sent as bytes because a str body would be encoded as latin-1
+        self.conn.authenticated_request(
+            self.conn.session.post,
+            self.conn.urls["viewconfs"],
+            data=json_dumps_bytes(post_data),
+            headers={"Content-Type": "application/json"},
+            expected_status=201,
+            error_message="Unable to add viewconf",
         )
 
-        if ret.status_code != 201:
-            raise UnknownConnectionException("Unable to add viewconf", ret)
-
     def __str__(self):
         """String representation."""
         return self.__repr__
@@ -782,33 +1574,52 @@ class ResgenProject:
         """String representation."""
         return f"{self.uuid[:8]}: {self.name}"
 
-    def sync_track_hub(self, base_url, dry=False):
-        """Sync a UCSC track hub."""
-        hub_url = f"{base_url}/hub.txt"
+    def sync_track_hub(self, base_url, dry=False, max_workers=SYNC_WORKERS):
+        """Sync a UCSC track hub.
 
-        ret = requests.get(hub_url)
+        Args:
+            base_url: The url of the directory containing hub.txt
+            dry: Only print the datasets that would be synced
+            max_workers: The number of tracks to sync concurrently
+        """
+        hub_url = f"{base_url}/hub.txt"
 
-        content = ret.content.decode("utf8")
-        hub_info = parse_ucsc(content)[0]
+        ret = self.conn.anonymous_session.get(hub_url, timeout=REQUEST_TIMEOUT)
+        hub_info = parse_ucsc(ret.content)[0]
 
         genomes_url = f'{base_url}/{hub_info["genomesFile"]}'
-        ret = requests.get(genomes_url)
+        ret = self.conn.anonymous_session.get(genomes_url, timeout=REQUEST_TIMEOUT)
+        genome_infos = parse_ucsc(ret.content)
 
-        content = ret.content.decode("utf8")
-        genome_infos = parse_ucsc(content)
+        # fetch the project's datasets once rather than once per track
+        existing_datasets = None if dry else self.datasets_by_filename()
 
         for genome_info in genome_infos:
-            self.sync_genome(base_url, genome_info, dry)
+            self.sync_genome(
+                base_url, genome_info, dry, existing_datasets, max_workers
+            )
+
+    def sync_genome(
+        self,
+        base_url,
+        genome_info,
+        dry=False,
+        existing_datasets=None,
+        max_workers=SYNC_WORKERS,
+    ):
+        """Sync a genome within a track hub.
 
-    def sync_genome(self, base_url, genome_info, dry=False):
-        """Sync a genome within a track hub."""
+        Tracks are independent of each other so they're synced
+        concurrently by a pool of `max_workers` threads.
+        """
         track_db_url = f"{base_url}/{genome_info['trackDb']}"
         # print("track_db_url:", track_db_url)
-        ret = requests.get(track_db_url)
-        content = ret.content.decode("utf8")
-        genome_info_path = op.split(genome_info["trackDb"])[0]
+        ret = self.conn.anonymous_session.get(track_db_url, timeout=REQUEST_TIMEOUT)
+        genome_info_path = op.dirname(genome_info["trackDb"])
+
+        track_infos = parse_ucsc(ret.content)
+        to_sync = []
 
-        track_infos = parse_ucsc(content)
         for track in track_infos:
             # print("------------------")
             # print("track:", track)
@@ -833,18 +1644,90 @@ class ResgenProject:
                 description = track.get("longLabel")
 
                 if not dry:
-                    self.sync_dataset(
-                        big_data_path,
-                        sync_remote=False,
-                        datatype=datatype,
-                        filetype=track_type.lower(),
-                        assembly=assembly,
-                        name=name,
-                        description=description,
-                    )
+                    to_sync += [
+                        {
+                            "filepath": big_data_path,
+                            "sync_remote": False,
+                            "datatype": datatype,
+                            "filetype": track_type.lower(),
+                            "assembly": assembly,
+                            "name": name,
+                            "description": description,
+                        }
+                    ]
                 else:
                     print(f"Syncing: {big_data_path} assembly: {assembly}")
 
+        if to_sync:
+            self.sync_datasets(to_sync, existing_datasets, max_workers)
+
+    def sync_datasets(
+        self,
+        items: typing.List[typing.Dict[str, typing.Any]],
+        existing_datasets=None,
+        max_workers=SYNC_WORKERS,
+        sync_full_path: bool = False,
+    ) -> typing.List[ResgenDataset]:
+        """Sync several datasets.
+
+        The project's datasets are listed once for the whole batch rather
+        than once per item, and items are synced concurrently by a pool
+        of `max_workers` threads.
+
+        Args:
+            items: The keyword arguments to pass to `sync_dataset` for
+                each dataset
+            existing_datasets: The output of `datasets_by_filename`.
+                Fetched if not provided and there is more than one item.
+            max_workers: The number of datasets to sync concurrently
+            sync_full_path: Whether the items are synced by their full path
+
+        Returns:
+            The synced datasets in the same order as `items`
+        """
+        # items with the same filename are synced one after another so
+        # that later ones update the dataset added by the first
+        groups = {}
+        for i, kw in enumerate(items):
+            filepath = kw["filepath"]
+            filename = filepath if sync_full_path else op.basename(filepath)
+            groups.setdefault(filename, []).append(i)
+
+        if existing_datasets is None and len(items) > 1:
+            existing_datasets = self.datasets_by_filename(sync_full_path)
+
+        def sync_group(indices):
+            return [
+                self.sync_dataset(
+                    **items[i],
+                    sync_full_path=sync_full_path,
+                    existing_datasets=existing_datasets,
+                )
+                for i in indices
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(sync_group, indices) for indices in groups.values()
+            ]
+
+            try:
+                for future in as_completed(futures):
+                    # re-raise any exception that occurred while syncing
+                    future.result()
+            except BaseException:
+                # don't start syncing any of the remaining items
+                for future in futures:
+                    future.cancel()
+                raise
+
+        synced = [None] * len(items)
+        for indices, future in zip(groups.values(), futures):
+            for i, dataset in zip(indices, future.result()):
+                synced[i] = dataset
+
+        return synced
+
     def sync_dataset(
         self,
         filepath: str,
@@ -855,6 +1738,7 @@ class ResgenProject:
         index_filepath=None,
         force_update: bool = False,
         sync_full_path: bool = False,
+        existing_datasets=None,
         **metadata,
     ):
         """Check if this file already exists in this dataset.
@@ -868,7 +1752,10 @@ class ResgenProject:
         If more than one dataset with this name exists, raise a ValueError.
 
         Args:
-
+            existing_datasets: The output of `datasets_by_filename`. If
+                provided, it is used instead of querying the server for
+                datasets with the same filename and is updated with the
+                synced dataset.
         """
         logger.info("Syncing dataset: %s", filepath)
         if (
@@ -881,35 +1768,42 @@ class ResgenProject:
             download = False
 
         if not sync_full_path:
-            filename = op.split(filepath)[1]
+            filename = op.basename(filepath)
         else:
             filename = filepath
 
         logger.info("Filename used to sync: %s", filename)
 
-        try:
-            datasets = self.conn.find_datasets(project=self, datafile=filename)
-        except UnknownConnectionException:
-            logger.info("No such datasets found")
-            datasets = []
+        if existing_datasets is not None:
+            matching_datasets = existing_datasets.get(filename, [])
+        else:
+            try:
+                try:
+                    datasets = self.conn.find_datasets(
+                        project=self, datafile=filename, limit=2
+                    )
+                except TooManyDatasetsException:
+                    # the server's datafile filter matched more than just
+                    # this filename so page through all the candidates
+                    datasets = self.conn.iter_datasets(project=self, datafile=filename)
+
+                matching_datasets = [
+                    d for d in datasets if ds_filename(d, sync_full_path) == filename
+                ]
+            except UnknownConnectionException:
+                logger.info("No such datasets found")
+                matching_datasets = []
 
         # filetype, datatype = fill_filetype_and_datatype(filename, filetype, datatype)
 
-        def ds_filename(dataset):
-            """Return just the filename of a dataset."""
-            if not sync_full_path:
-                filename = op.split(dataset.data["datafile"])[1]
-            else:
-                return dataset.data["datafile"]
-            return filename
-
-        matching_datasets = [d for d in datasets if ds_filename(d) == filename]
-
         if len(matching_datasets) > 1:
             raise ValueError(
                 f"More than one matching dataset: {str(matching_datasets)}"
             )
 
+        stale_uuid = None
+        current = None
+
         if not matching_datasets:
             uuid = self.add_dataset(
                 filepath,
@@ -921,46 +1815,81 @@ class ResgenProject:
             logger.info("Found dataset with the same filepath, updating metadata")
             uuid = matching_datasets[0].data["uuid"]
 
-            if force_update:
+            if force_update and not download and has_same_content(
+                matching_datasets[0], filepath
+            ):
+                logger.info("File is unchanged, skipping the upload")
+                current = matching_datasets[0]
+            elif force_update:
                 new_uuid = self.add_dataset(
                     filepath,
                     download=download,
                     index_filepath=index_filepath,
                     sync_remote=sync_remote,
                 )
-                self.delete_dataset(uuid)
-                uuid = new_uuid
+                stale_uuid, uuid = uuid, new_uuid
+            else:
+                current = matching_datasets[0]
 
-        if not filetype:
-            filetype = hgu.infer_filetype(filepath)
-            logger.info(f"Inferred filetype: {filetype}")
-        if not datatype:
-            datatype = hgu.infer_datatype(filetype)
-            logger.info(f"Inferred datatype: {datatype}")
+        if not filetype or not datatype:
+            import higlass.utils as hgu
 
-        to_update = {"tags": []}
+            if not filetype:
+                filetype = hgu.infer_filetype(filepath)
+                logger.info(f"Inferred filetype: {filetype}")
+            if not datatype:
+                datatype = hgu.infer_datatype(filetype)
+                logger.info(f"Inferred datatype: {datatype}")
+
+        to_update = {}
         if "name" in metadata:
             to_update["name"] = metadata["name"]
-        if "tags" in metadata:
-            to_update["tags"] = metadata["tags"]
 
-        if filetype:
-            to_update["tags"] = [
-                t for t in to_update["tags"] if not t["name"].startswith("filetype:")
-            ]
-            to_update["tags"] += [{"name": f"filetype:{filetype}"}]
-        if datatype:
-            to_update["tags"] = [
-                t for t in to_update["tags"] if not t["name"].startswith("datatype:")
-            ]
-            to_update["tags"] += [{"name": f"datatype:{datatype}"}]
-        if assembly:
-            to_update["tags"] = [
-                t for t in to_update["tags"] if not t["name"].startswith("assembly:")
-            ]
-            to_update["tags"] += [{"name": f"assembly:{assembly}"}]
+        type_tags = {"filetype": filetype, "datatype": datatype, "assembly": assembly}
+        to_update["tags"] = update_tags(
+            metadata.get("tags", []),
+            **{tag: value for tag, value in type_tags.items() if value},
+        )
+
+        if current is not None and metadata_matches(current, to_update):
+            # skip the update and the refetch that follows it when
+            # resyncing files that haven't changed
+            logger.info("Dataset metadata is already up to date")
+            dataset = current
+        elif stale_uuid:
+            # the old dataset is independent of the new one so delete it
+            # while the new one's metadata is being updated
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                deleted = executor.submit(self.delete_dataset, stale_uuid)
+                dataset = self.conn.update_dataset(uuid, to_update)
+                deleted.result()
+        else:
+            dataset = self.conn.update_dataset(uuid, to_update)
+
+        if existing_datasets is not None:
+            existing_datasets[filename] = [dataset]
+
+        return dataset
+
+
+@functools.lru_cache(maxsize=1)
+def load_credentials() -> typing.Optional[typing.Tuple[str, str]]:
+    """Load the username and password from ~/.resgen/credentials.
+
+    The file is only read once per process.
+
+    Returns:
+        The username and password or None if there is no credentials file
+    """
+    from dotenv import load_dotenv
+
+    env_path = Path.home() / ".resgen" / "credentials"
 
-        return self.conn.update_dataset(uuid, to_update)
+    if not env_path.exists():
+        return None
+
+    load_dotenv(env_path)
+    return os.getenv("RESGEN_USERNAME"), os.getenv("RESGEN_PASSWORD")
 
 
 def connect(
@@ -969,14 +1898,16 @@ def connect(
     host: str = RESGEN_HOST,
     bucket: str = RESGEN_BUCKET,
 ) -> ResgenConnection:
-    """Open a connection to resgen."""
-    env_path = Path.home() / ".resgen" / "credentials"
+    """Open a connection to resgen.
 
-    if env_path.exists():
-        load_dotenv(env_path)
+    Connections are reused by later calls with the same credentials,
+    host and bucket so that they share their pooled sessions and caches.
+    Create a `ResgenConnection` directly to get a separate one.
+    """
+    credentials = load_credentials()
 
-        username = os.getenv("RESGEN_USERNAME")
-        password = os.getenv("RESGEN_PASSWORD")
+    if credentials is not None:
+        username, password = credentials
     else:
         username = input("Username:")
         password = getpass.getpass("Password:")
@@ -986,4 +1917,12 @@ def connect(
     if password is None:
         password = os.getenv("RESGEN_PASSWORD")
 
+    return shared_connection(username, password, host, bucket)
+
+
+@functools.lru_cache(maxsize=4)
+def shared_connection(
+    username: str, password: str, host: str, bucket: str
+) -> ResgenConnection:
+    """Create a connection that's shared by calls to `connect`."""
     return ResgenConnection(username, password, host, bucket)
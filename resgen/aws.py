@@ -1,3 +1,4 @@
+import functools
 import logging
 import os
 import sys
@@ -5,26 +6,76 @@ import threading
 import typing
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
+MB = 1024 * 1024
+
+# upload large files in parallel 8MB parts
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+# creating clients from boto3's default session isn't thread safe
+S3_CLIENT_LOCK = threading.Lock()
+
 
 class ProgressPercentage(object):
     def __init__(self, filename):
         self._filename = filename
         self._size = float(os.path.getsize(filename))
         self._seen_so_far = 0
+        self._last_percent = None
         self._lock = threading.Lock()
 
     def __call__(self, bytes_amount):
         # To simplify, assume this is hooked up to a single filename
+        # only hold the lock shared by the upload threads while updating
+        # the counters and do the formatting and output outside of it
         with self._lock:
             self._seen_so_far += bytes_amount
-            percentage = (self._seen_so_far / self._size) * 100
-            sys.stdout.write(
-                "\r%s  %s / %s  (%.2f%%)"
-                % (self._filename, self._seen_so_far, self._size, percentage)
-            )
-            sys.stdout.flush()
+            seen_so_far = self._seen_so_far
+            percentage = (seen_so_far / self._size) * 100 if self._size else 100
+
+            # boto3 reports every chunk that's sent from each of the
+            # upload threads so only redraw when the percentage changes
+            if int(percentage) == self._last_percent:
+                return
+            self._last_percent = int(percentage)
+
+        sys.stdout.write(
+            "\r%s  %s / %s  (%.2f%%)"
+            % (self._filename, seen_so_far, self._size, percentage)
+        )
+        sys.stdout.flush()
+
+
+@functools.lru_cache(maxsize=4)
+def _s3_client(access_key_id: str, secret_access_key: str, session_token: str):
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        aws_session_token=session_token,
+    )
+
+
+def s3_client(credentials: typing.Dict[str, str]):
+    """Get an S3 client for a set of upload credentials.
+
+    Clients are reused for as long as the same credentials are so that
+    uploads share their connection pool and the service model is only
+    loaded once.
+    """
+    with S3_CLIENT_LOCK:
+        return _s3_client(
+            credentials["accessKeyId"],
+            credentials["secretAccessKey"],
+            credentials["sessionToken"],
+        )
 
 
 def upload_file(
@@ -32,6 +83,7 @@ def upload_file(
     bucket: str,
     credentials: typing.Dict[str, str],
     object_name: str = None,
+    config: TransferConfig = TRANSFER_CONFIG,
 ):
     """Upload a file to an S3 bucket
 
@@ -41,6 +93,7 @@ def upload_file(
         credentials: A dictionary containing the `awsAccessKeyId`,
             `secretAccessKey` and `sessionToken` entries
         object_name: S3 object name. If not specified then file_name is used
+        config: The transfer configuration controlling multipart uploads
 
     Returns:
         True if file was uploaded, else False
@@ -52,16 +105,13 @@ def upload_file(
         object_name = file_name
 
     # Upload the file
-    s3_client = boto3.client(
-        "s3",
-        aws_access_key_id=credentials["accessKeyId"],
-        aws_secret_access_key=credentials["secretAccessKey"],
-        aws_session_token=credentials["sessionToken"],
-    )
-
     try:
-        s3_client.upload_file(
-            file_name, bucket, object_name, Callback=ProgressPercentage(file_name)
+        s3_client(credentials).upload_file(
+            file_name,
+            bucket,
+            object_name,
+            Callback=ProgressPercentage(file_name),
+            Config=config,
         )
     except ClientError as client_error:
         logging.error(client_error)
@@ -0,0 +1,143 @@
+import contextlib
+import typing
+
+import httpx
+import requests
+
+
+def to_httpx_timeout(timeout):
+    """Convert a requests style (connect, read) timeout to an httpx one."""
+    if timeout is None or isinstance(timeout, httpx.Timeout):
+        return timeout
+
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+    return httpx.Timeout(timeout)
+
+
+@contextlib.contextmanager
+def translate_errors():
+    """Raise httpx errors as their requests equivalents so that callers
+    only need to handle requests exceptions."""
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.ConnectionError(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.RequestException(str(e)) from e
+
+
+class HttpxResponse:
+    """Wrap an httpx response so that it can be used like a
+    requests.Response by the rest of resgen."""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    @property
+    def content(self) -> bytes:
+        # streamed responses are only read when their content is needed
+        with translate_errors():
+            return self.response.read()
+
+    @property
+    def encoding(self):
+        return self.response.encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self.response.encoding = value
+
+    def iter_lines(self, decode_unicode: bool = False):
+        """Iterate over the lines of the response body."""
+        with translate_errors():
+            yield from self.response.iter_lines()
+
+
+class HttpxSession:
+    """A drop-in replacement for the subset of requests.Session used by
+    ResgenConnection that multiplexes requests over HTTP/2."""
+
+    def __init__(self, max_connections: int = 10, retries: int = 3):
+        """Create an HTTP/2 capable client.
+
+        Args:
+            max_connections: The maximum number of connections to keep open
+            retries: The number of times to retry failed connection attempts
+        """
+        transport = httpx.HTTPTransport(
+            http2=True,
+            retries=retries,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.client = httpx.Client(transport=transport, follow_redirects=True)
+
+    @property
+    def headers(self):
+        return self.client.headers
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params=None,
+        data=None,
+        json=None,
+        headers: typing.Dict[str, typing.Optional[str]] = None,
+        timeout=None,
+        stream: bool = False,
+    ) -> HttpxResponse:
+        """Send a request.
+
+        As with requests, a header set to None removes that header
+        from the session's defaults. If `stream` is set, the body is
+        only read as it's iterated over or when `content` is accessed.
+        """
+        # httpx expects raw request bodies to be passed as content
+        content = None
+        if isinstance(data, (str, bytes)):
+            content, data = data, None
+
+        request = self.client.build_request(
+            method,
+            url,
+            params=params,
+            content=content,
+            data=data,
+            json=json,
+            timeout=to_httpx_timeout(timeout),
+        )
+
+        for key, value in (headers or {}).items():
+            if value is None:
+                request.headers.pop(key, None)
+            else:
+                request.headers[key] = value
+
+        with translate_errors():
+            return HttpxResponse(self.client.send(request, stream=stream))
+
+    def get(self, url: str, **kwargs) -> HttpxResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> HttpxResponse:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> HttpxResponse:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> HttpxResponse:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.client.close()
@@ -1,7 +1,4 @@
-import getpass
 import logging
-import os
-from pathlib import Path
 
 import click
 import resgen as rg
@@ -23,8 +20,11 @@ def sync():
 @click.option("--name", default=None)
 @click.option("--sync-full-path/--no-sync-full-path", default=False)
 @click.option("-f", "--force-update", default=False)
+@click.option(
+    "-j", "--workers", default=1, help="The number of files to sync concurrently"
+)
 def datasets(gruser, project, datasets, tag, sync_remote, name, sync_full_path,
-             force_update):
+             force_update, workers):
     """Upload if a file with the same name doesn't already exist.
 
     If files are of the form "filename1,filename2" it will be assumed
@@ -32,6 +32,8 @@ def datasets(gruser, project, datasets, tag, sync_remote, name, sync_full_path,
 
     If -f/--force-update is specified, files will be uploaded even if they already exist
     in the project.
+
+    Use -j/--workers to sync several files at the same time.
     """
     try:
         try:
@@ -47,6 +49,7 @@ def datasets(gruser, project, datasets, tag, sync_remote, name, sync_full_path,
             metadata["name"] = name
         # metadata = dict([t.split(":")[:2] for t in tag])
 
+        items = []
         for dataset in datasets:
             parts = dataset.split(",")
 
@@ -57,27 +60,25 @@ def datasets(gruser, project, datasets, tag, sync_remote, name, sync_full_path,
                     parts[1],
                     str(metadata),
                 )
-                project.sync_dataset(
-                    parts[0],
-                    index_filepath=parts[1],
-                    sync_remote=sync_remote,
-                    sync_full_path=sync_full_path,
-                    force_update=force_update,
-                    **metadata,
-                )
             else:
                 logger.info(
                     "Syncing dataset: %s with metadata: %s",
                     parts[0],
                     str(metadata),
                 )
-                project.sync_dataset(
-                    dataset,
-                    sync_remote,
-                    sync_full_path=sync_full_path,
-                    force_update=force_update,
-                    **metadata
-                )
+
+            items.append(
+                {
+                    "filepath": parts[0],
+                    "index_filepath": parts[1] if len(parts) > 1 else None,
+                    "sync_remote": sync_remote,
+                    "force_update": force_update,
+                    **metadata,
+                }
+            )
+
+        # the project's datasets are listed once for all of the files
+        project.sync_datasets(items, max_workers=workers, sync_full_path=sync_full_path)
     except rg.InvalidCredentialsException:
         logger.error(
             "Invalid credentials. Make sure that they are set in either "
@@ -46,6 +46,7 @@ setup_args = {
         "Programming Language :: Python :: 3.7",
     ],
     "install_requires": get_requirements("requirements.txt"),
+    "extras_require": {"http2": ["httpx[http2]"], "orjson": ["orjson"]},
     "setup_requires": [],
     "tests_require": ["pytest"],
     "entry_points": {"console_scripts": ["resgen = resgen.cli:cli"]}
@@ -1,9 +1,14 @@
+import base64
 import json
 import os.path as op
 import tempfile
+import threading
+import time
 from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest.mock import MagicMock, patch
 
+import pytest
 import requests
 import requests_mock
 
@@ -15,6 +20,22 @@ def test_create_tags():
 
     assert tags[0]["name"] == "datatype:matrix"
 
+    tags = rg.update_tags(
+        [{"name": "datatype:vector"}, {"name": "cell:a"}, {"name": "cell:b"}],
+        datatype="matrix",
+        assembly="hg38",
+    )
+
+    assert [t["name"] for t in tags] == [
+        "cell:a",
+        "cell:b",
+        "datatype:matrix",
+        "assembly:hg38",
+    ]
+
+    tags = rg.update_tags([{"name": "cell:a"}, {"name": "cell:a"}], datatype="matrix")
+    assert [t["name"] for t in tags] == ["cell:a", "datatype:matrix"]
+
 
 def test_list_projects():
     with requests_mock.Mocker() as m:
@@ -25,7 +46,7 @@ def test_list_projects():
         m.get(f"{rg.RESGEN_HOST}/api/v1/which_user/", json={"not": "important"})
         m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
 
-        rgc = rg.ResgenConnection("user", "password")
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
         projects = rgc.list_projects()
 
         assert len(projects) == 1
@@ -63,3 +84,764 @@ def test_sync_dataset_new():
     project.add_dataset = MagicMock()
     project.sync_dataset(filepath)
     assert not project.add_dataset.called
+
+
+def test_session_authorization_header():
+    with requests_mock.Mocker() as m:
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/tilesets/u1/",
+            json={"uuid": "u1", "datafile": "blah.txt"},
+        )
+        m.get(f"{rg.RESGEN_HOST}/api/v1/which_user/", json={"not": "important"})
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        dataset = rgc.get_dataset("u1")
+
+        assert dataset.uuid == "u1"
+        assert m.last_request.headers["Authorization"] == "Bearer xy"
+
+
+def test_connection_closes_sessions():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+
+        with rg.ResgenConnection("user", "password", cache_token=False) as rgc:
+            rgc.session = MagicMock()
+            rgc.anonymous_session = MagicMock()
+
+        assert rgc.session.close.called
+        assert rgc.anonymous_session.close.called
+
+
+def test_connect_reuses_connections():
+    with patch("resgen.load_credentials", return_value=("user", "password")), patch(
+        "resgen.ResgenConnection"
+    ) as connection:
+        assert rg.connect() is rg.connect()
+        assert connection.call_count == 1
+
+        rg.connect(host="https://other.host")
+        assert connection.call_count == 2
+
+    rg.shared_connection.cache_clear()
+
+
+def test_token_expiry():
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": 1000}).encode())
+    token = f"header.{payload.decode().rstrip('=')}.signature"
+
+    assert rg.token_expiry(token) == 970
+    assert rg.token_expiry("xy") is None
+
+
+def test_authenticated_request_retries_on_401():
+    with requests_mock.Mocker() as m:
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/tilesets/u1/",
+            [
+                {"status_code": 401},
+                {"json": {"uuid": "u1", "datafile": "blah.txt"}},
+            ],
+        )
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        dataset = rgc.get_dataset("u1")
+
+        assert dataset.uuid == "u1"
+        assert m.call_count == 4
+
+        # the rejected response's connection is released before retrying
+        rejected, accepted = MagicMock(status_code=401), MagicMock(status_code=200)
+        send = MagicMock(side_effect=[rejected, accepted])
+        assert rgc.authenticated_request(send, "url", stream=True) is accepted
+        assert rejected.close.called
+        assert not accepted.close.called
+
+
+def test_sync_dataset_existing_datasets():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.add_dataset = MagicMock()
+
+    project.conn.iter_datasets.return_value = [
+        rg.ResgenDataset(
+            conn=project.conn,
+            data={"uuid": "xx", "datafile": "aws/TbUN0fR-RDW_Ob2wk5KRkg/blah.txt"},
+        )
+    ]
+    existing_datasets = project.datasets_by_filename()
+    assert list(existing_datasets.keys()) == ["blah.txt"]
+
+    project.sync_dataset("/tmp/blah.txt", existing_datasets=existing_datasets)
+    project.sync_dataset("/tmp/other.txt", existing_datasets=existing_datasets)
+
+    assert not project.conn.find_datasets.called
+    assert project.add_dataset.call_count == 1
+    assert "other.txt" in existing_datasets
+
+
+def test_sync_dataset_force_update_same_content():
+    filepath = op.join(tempfile.mkdtemp(), "blah.txt")
+    with open(filepath, "w") as f:
+        f.write("hello")
+
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.add_dataset = MagicMock()
+    data = {"uuid": "xx", "datafile": "blah.txt", "md5": rg.file_md5(filepath)}
+
+    project.sync_dataset(
+        filepath,
+        filetype="bigwig",
+        datatype="vector",
+        force_update=True,
+        existing_datasets={"blah.txt": [rg.ResgenDataset(project.conn, data)]},
+    )
+    assert not project.add_dataset.called
+
+    data["md5"] = "changed"
+    project.sync_dataset(
+        filepath,
+        filetype="bigwig",
+        datatype="vector",
+        force_update=True,
+        existing_datasets={"blah.txt": [rg.ResgenDataset(project.conn, data)]},
+    )
+    assert project.add_dataset.called
+
+
+def test_sync_dataset_unchanged():
+    project = rg.ResgenProject("xxx", MagicMock())
+    existing_datasets = {
+        "blah.txt": [
+            rg.ResgenDataset(
+                conn=project.conn,
+                data={
+                    "uuid": "xx",
+                    "datafile": "blah.txt",
+                    "name": "Blah",
+                    "tags": [{"name": "datatype:vector"}, {"name": "filetype:bigwig"}],
+                },
+            )
+        ]
+    }
+
+    kwargs = {"filetype": "bigwig", "datatype": "vector", "name": "Blah"}
+    dataset = project.sync_dataset(
+        "/tmp/blah.txt", existing_datasets=existing_datasets, **kwargs
+    )
+
+    assert dataset.uuid == "xx"
+    assert not project.conn.update_dataset.called
+
+    kwargs["name"] = "New name"
+    project.sync_dataset("/tmp/blah.txt", existing_datasets=existing_datasets, **kwargs)
+    assert project.conn.update_dataset.called
+
+
+def test_sync_dataset_force_update():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.add_dataset = MagicMock(return_value="new")
+    project.delete_dataset = MagicMock()
+
+    existing_datasets = {
+        "blah.txt": [
+            rg.ResgenDataset(
+                conn=project.conn, data={"uuid": "old", "datafile": "blah.txt"}
+            )
+        ]
+    }
+    project.sync_dataset(
+        "/tmp/blah.txt",
+        filetype="bigwig",
+        datatype="vector",
+        force_update=True,
+        existing_datasets=existing_datasets,
+    )
+
+    project.delete_dataset.assert_called_once_with("old")
+    assert project.conn.update_dataset.call_args[0][0] == "new"
+
+
+def test_sync_datasets():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.iter_datasets.return_value = []
+    project.add_dataset = MagicMock(side_effect=lambda filepath, **kw: filepath)
+    project.conn.update_dataset.side_effect = lambda uuid, metadata: uuid
+
+    synced = project.sync_datasets(
+        [
+            {"filepath": "/tmp/a.bw", "filetype": "bigwig", "datatype": "vector"},
+            {"filepath": "/tmp/b.bw", "filetype": "bigwig", "datatype": "vector"},
+        ]
+    )
+
+    assert synced == ["/tmp/a.bw", "/tmp/b.bw"]
+    assert project.conn.iter_datasets.call_count == 1
+    assert not project.conn.find_datasets.called
+
+
+
+def test_sync_datasets_same_filename():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.iter_datasets.return_value = []
+    project.add_dataset = MagicMock(side_effect=lambda filepath, **kw: filepath)
+    project.conn.update_dataset.side_effect = lambda uuid, metadata: rg.ResgenDataset(
+        project.conn,
+        {"uuid": uuid, "datafile": op.basename(uuid), "tags": metadata["tags"]},
+    )
+
+    synced = project.sync_datasets(
+        [
+            {"filepath": "/s1/signal.bw", "filetype": "bigwig", "name": "s1"},
+            {"filepath": "/tmp/a.bw", "filetype": "bigwig"},
+            {"filepath": "/s2/signal.bw", "filetype": "bigwig", "name": "s2"},
+        ]
+    )
+
+    # the second signal.bw updates the dataset added by the first
+    assert [d.uuid for d in synced] == ["/s1/signal.bw", "/tmp/a.bw", "/s1/signal.bw"]
+    assert project.add_dataset.call_count == 2
+    names = [
+        c[0][1]["name"]
+        for c in project.conn.update_dataset.call_args_list
+        if c[0][0] == "/s1/signal.bw"
+    ]
+    assert names == ["s1", "s2"]
+
+
+def test_sync_datasets_failure():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.iter_datasets.return_value = []
+
+    def add_dataset(filepath, **kwargs):
+        if filepath == "/tmp/0.bw":
+            raise rg.UnknownConnectionException("Failed", MagicMock())
+        time.sleep(0.05)
+
+    project.add_dataset = MagicMock(side_effect=add_dataset)
+
+    with pytest.raises(rg.UnknownConnectionException):
+        project.sync_datasets(
+            [{"filepath": f"/tmp/{i}.bw", "filetype": "bigwig"} for i in range(10)],
+            max_workers=1,
+        )
+
+    # the remaining items are cancelled after the first failure
+    assert project.add_dataset.call_count <= 2
+
+
+def test_sync_genome():
+    track_db = (
+        "track t1\ntype bigWig\nbigDataUrl t1.bw\nshortLabel T1\n\n"
+        "track t2\ntype bigBed 6\nbigDataUrl t2.bb\nshortLabel T2\n\n"
+        "track t3\ntype vcfTabix\nbigDataUrl t3.vcf.gz\n"
+    )
+
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.anonymous_session = requests.Session()
+    project.sync_dataset = MagicMock()
+
+    with requests_mock.Mocker() as m:
+        m.get("http://hub/hg38/trackDb.txt", text=track_db)
+        project.sync_genome(
+            "http://hub", {"genome": "hg38", "trackDb": "hg38/trackDb.txt"}
+        )
+
+    synced = sorted(c[1]["filepath"] for c in project.sync_dataset.call_args_list)
+    assert synced == ["http://hub/hg38/t1.bw", "http://hub/hg38/t2.bb"]
+
+
+def test_add_download_dataset_backoff():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.authenticated_request.return_value.status_code = 201
+    project.conn.authenticated_request.return_value.content = json.dumps(
+        {"uuid": "xx"}
+    )
+    project.conn.stream_download_progress.return_value = []
+    project.conn.download_progress.side_effect = [
+        {"downloaded": 0, "uploaded": 0, "filesize": 10},
+        {"downloaded": 0, "uploaded": 0, "filesize": 10},
+        {"downloaded": 10, "uploaded": 0, "filesize": 10},
+        {"downloaded": 10, "uploaded": 10, "filesize": 10},
+    ]
+
+    with patch("time.sleep") as sleep, patch("sys.stdout") as stdout, patch(
+        "random.uniform", return_value=1
+    ):
+        assert project.add_download_dataset("http://blah.txt") == "xx"
+
+    # 0%, 50% and 100% followed by a newline
+    assert stdout.write.call_count == 4
+
+    delays = [c[0][0] for c in sleep.call_args_list]
+    assert delays == [0, 0.5 * 1.7, 0.5 * 1.7 ** 2, 0.5]
+
+
+def test_add_download_dataset_gives_up():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.authenticated_request.return_value.status_code = 201
+    project.conn.authenticated_request.return_value.content = json.dumps(
+        {"uuid": "xx"}
+    )
+    project.conn.stream_download_progress.return_value = []
+    project.conn.download_progress.side_effect = rg.UnknownConnectionException(
+        "Failed to retrieve download progress", MagicMock()
+    )
+
+    with patch("time.sleep"), pytest.raises(rg.UnknownConnectionException):
+        project.add_download_dataset("http://blah.txt")
+
+    assert project.conn.download_progress.call_count == rg.MAX_PROGRESS_FAILURES
+
+
+def test_add_download_dataset_queued():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.authenticated_request.return_value.status_code = 201
+    project.conn.authenticated_request.return_value.content = json.dumps(
+        {"uuid": "xx"}
+    )
+    project.conn.stream_download_progress.return_value = []
+    # a download with no recorded progress isn't counted as a failure
+    project.conn.download_progress.side_effect = [
+        rg.DownloadProgressUnavailableException("Not yet", MagicMock())
+    ] * (rg.MAX_PROGRESS_FAILURES + 1) + [
+        requests.ConnectionError(),
+        {"downloaded": 10, "uploaded": 10, "filesize": 10},
+    ]
+
+    with patch("time.sleep"), patch("sys.stdout"):
+        assert project.add_download_dataset("http://blah.txt") == "xx"
+
+
+def test_download_progress_unavailable():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(f"{rg.RESGEN_HOST}/api/v1/tilesets/xx/", json={"uuid": "xx"})
+        m.get(f"{rg.RESGEN_HOST}/api/v1/download_progress/", status_code=404)
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+
+        with pytest.raises(rg.DownloadProgressUnavailableException):
+            rgc.download_progress("xx")
+
+        # server errors aren't mistaken for a queued download
+        m.get(f"{rg.RESGEN_HOST}/api/v1/download_progress/", status_code=503)
+        with pytest.raises(rg.UnknownConnectionException) as e:
+            rgc.download_progress("xx")
+        assert not isinstance(e.value, rg.DownloadProgressUnavailableException)
+
+
+def test_stream_download_progress():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/download_progress/",
+            text=(
+                ": keep-alive\n\n"
+                'data: {"downloaded": 5, "uploaded": 0, "filesize": 10}\n\n'
+                'data: {"downloaded": 10, "uploaded": 10, "filesize": 10}\n\n'
+            ),
+            headers={"Content-Type": "text/event-stream"},
+        )
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        updates = list(rgc.stream_download_progress("xx"))
+
+        assert [u["downloaded"] for u in updates] == [5, 10]
+        assert m.last_request.headers["Accept"] == "text/event-stream"
+
+        # servers that don't stream progress are polled instead
+        m.get(f"{rg.RESGEN_HOST}/api/v1/download_progress/", status_code=406)
+        assert list(rgc.stream_download_progress("xx")) == []
+
+
+def test_add_viewconf():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.post(f"{rg.RESGEN_HOST}/api/v1/viewconfs/", status_code=201)
+
+        conn = rg.ResgenConnection("user", "password", cache_token=False)
+        project = rg.ResgenProject("p1", conn)
+        project.add_viewconf({"views": []}, "test")
+
+        body = m.last_request.json()
+        assert m.last_request.headers["Content-Type"] == "application/json"
+        assert json.loads(body["viewconf"]) == {"views": []}
+        assert body["project"] == "p1"
+
+
+def test_add_viewconf_unicode():
+    bodies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            bodies.append(self.rfile.read(int(self.headers["Content-Length"])))
+
+            if self.path == "/oauth/token/":
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b'{"access_token": "xy"}')
+            else:
+                self.send_response(201)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    # the body has to be encoded for real, which requests_mock skips
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        with patch("resgen.RESGEN_AUTH0_DOMAIN", host):
+            conn = rg.ResgenConnection("user", "password", host, cache_token=False)
+            project = rg.ResgenProject("p1", conn)
+
+            for name in ["café", "α-tubulin"]:
+                project.add_viewconf({"views": [], "name": name}, name)
+
+                body = json.loads(bodies[-1].decode("utf8"))
+                assert body["name"] == name
+                assert json.loads(body["viewconf"])["name"] == name
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_chrominfo_from_string():
+    for chromsizes in [
+        "chr1\t10\nchr2\t5\nchr3\t7\n",
+        "chr1\t10\tx\nchr2\t5\nchr3\t7",
+        "\nchr1\t10\r\nchr2\t5\r\nchr3\t7\r\n\n",
+    ]:
+        chrom_info = rg.get_chrominfo_from_string(chromsizes)
+
+        assert chrom_info.chrom_order == ["chr1", "chr2", "chr3"]
+        assert chrom_info.chrom_lengths == {"chr1": 10, "chr2": 5, "chr3": 7}
+        assert chrom_info.cum_chrom_lengths == {"chr1": 0, "chr2": 10, "chr3": 15}
+        assert chrom_info.total_length == 22
+        assert chrom_info.to_abs("chr2", 3) == 13
+
+    for chromsizes in ["chr1 100 5 6\n\nchr2 200", "chr1\t10\nchr2\n"]:
+        with pytest.raises(ValueError):
+            rg.get_chrominfo_from_string(chromsizes)
+
+
+def test_parse_ucsc():
+    hub = (
+        "# comment\ntrack t1\ntype bigWig\nbigDataUrl t1.bw\n"
+        "shortLabel Track  1\n\n\n"
+        "track t2\n    type bigBed 6\n\n# only a comment\n"
+    )
+
+    assert rg.parse_ucsc(hub) == [
+        {
+            "track": "t1",
+            "type": "bigWig",
+            "bigDataUrl": "t1.bw",
+            "shortLabel": "Track  1",
+        },
+        {"track": "t2", "type": "bigBed 6"},
+    ]
+    assert rg.parse_ucsc(hub.encode("utf8")) == rg.parse_ucsc(hub)
+
+
+def test_upload_to_resgen_aws():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/prepare_file_upload/",
+            json={"fileDirectory": "aws/dir", "uploadBucketPrefix": "prefix"},
+        )
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+
+        with patch("resgen.aws.upload_file", return_value=True) as upload_file:
+            paths = rgc.upload_to_resgen_aws("/tmp/a.vcf.gz", index_filepath="a.tbi")
+            assert paths == ("aws/dir/a.vcf.gz", "aws/dir/a.tbi")
+            assert upload_file.call_count == 2
+
+        with patch("resgen.aws.upload_file", side_effect=[True, False]):
+            paths = rgc.upload_to_resgen_aws("/tmp/a.vcf.gz", index_filepath="a.tbi")
+            assert paths == (None, None)
+
+
+def test_upload_progress():
+    from resgen.aws import ProgressPercentage
+
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(b"x" * 1000)
+        f.flush()
+        progress = ProgressPercentage(f.name)
+
+        with patch("sys.stdout") as stdout:
+            for _ in range(1000):
+                progress(1)
+
+    # one redraw per percent rather than per chunk
+    assert stdout.write.call_count <= 101
+
+
+def test_s3_client_reused():
+    from resgen import aws
+
+    credentials = {"accessKeyId": "a", "secretAccessKey": "s", "sessionToken": "t"}
+
+    with patch("boto3.client") as client:
+        assert aws.s3_client(credentials) is aws.s3_client(dict(credentials))
+        assert client.call_count == 1
+
+        aws.s3_client({**credentials, "sessionToken": "t2"})
+        assert client.call_count == 2
+
+    aws._s3_client.cache_clear()
+
+
+def test_find_datasets_query():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/list_tilesets/",
+            json={"count": 1, "results": [{"uuid": "u1", "datafile": "a&b.txt"}]},
+        )
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        datasets = rgc.find_datasets("a&b", datatype="matrix", assembly="hg38")
+
+        assert datasets[0].uuid == "u1"
+        assert m.last_request.qs == {
+            "limit": ["1000"],
+            "ac": ["a&b"],
+            "t": ["datatype:matrix", "assembly:hg38"],
+        }
+
+
+def test_iter_datasets_pages():
+    pages = [
+        {"json": {"count": 3, "results": [{"uuid": "u1", "datafile": "a"}]}},
+        {"json": {"count": 3, "results": [{"uuid": "u2", "datafile": "b"}]}},
+        {"json": {"count": 3, "results": [{"uuid": "u3", "datafile": "c"}]}},
+    ]
+
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(f"{rg.RESGEN_HOST}/api/v1/list_tilesets/", pages)
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        datasets = list(rgc.iter_datasets(datatype="matrix", page_size=1))
+
+        assert [d.uuid for d in datasets] == ["u1", "u2", "u3"]
+        assert m.last_request.qs == {
+            "limit": ["1"],
+            "offset": ["2"],
+            "ac": [""],
+            "t": ["datatype:matrix"],
+        }
+
+        # pages past the limit aren't requested
+        m.get(f"{rg.RESGEN_HOST}/api/v1/list_tilesets/", pages)
+        m.reset_mock()
+        datasets = list(rgc.iter_datasets(page_size=1, limit=2))
+        assert [d.uuid for d in datasets] == ["u1", "u2"]
+        assert m.call_count == 2
+        assert m.last_request.qs["offset"] == ["1"]
+
+
+def test_list_datasets():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.conn.iter_datasets.return_value = iter(range(10))
+
+    assert project.list_datasets(limit=10, filename="a.bw") == list(range(10))
+    project.conn.iter_datasets.assert_called_with(
+        project=project, datafile="a.bw", page_size=10, limit=10
+    )
+
+
+def test_sync_dataset_datafile_limit():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.add_dataset = MagicMock()
+    project.conn.find_datasets.side_effect = rg.TooManyDatasetsException(
+        "More datasets available"
+    )
+    project.conn.iter_datasets.return_value = iter(
+        [
+            rg.ResgenDataset(
+                conn=project.conn, data={"uuid": "1", "datafile": "a.bw"}
+            ),
+            rg.ResgenDataset(
+                conn=project.conn, data={"uuid": "2", "datafile": "aa.bw"}
+            ),
+            rg.ResgenDataset(
+                conn=project.conn, data={"uuid": "3", "datafile": "ab.bw"}
+            ),
+        ]
+    )
+
+    project.sync_dataset("/tmp/a.bw")
+
+    assert project.conn.find_datasets.call_args[1]["limit"] == 2
+    # the candidates are paged through rather than fetched all at once
+    project.conn.iter_datasets.assert_called_once_with(
+        project=project, datafile="a.bw"
+    )
+    assert not project.add_dataset.called
+
+
+def test_get_chrominfo():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(
+            f"{rg.RESGEN_HOST}/api/v1/chrom-sizes/?id=c1",
+            content=b"chr1\t10\nchr2\t5\n",
+        )
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        chrom_info = rgc.get_chrominfo(MagicMock(uuid="c1"))
+
+        assert chrom_info.chrom_order == ["chr1", "chr2"]
+        assert chrom_info.cum_chrom_lengths == {"chr1": 0, "chr2": 10}
+        assert chrom_info.total_length == 15
+
+    # a crlf pair split across the 512 byte chunks that requests reads
+    # bodies in mustn't be parsed as an extra blank line
+    lines = [f"chr{i}\t{1000 + i}\r\n" for i in range(17, 217)]
+    body = "".join(lines).encode("utf8")
+    assert any(body[k : k + 2] == b"\r\n" for k in range(511, len(body), 512))
+
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(f"{rg.RESGEN_HOST}/api/v1/chrom-sizes/?id=c1", content=body)
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+        chrom_info = rgc.get_chrominfo(MagicMock(uuid="c1"))
+
+        assert len(chrom_info.chrom_order) == 200
+        assert chrom_info.chrom_lengths["chr216"] == 1216
+
+
+def test_project_cache():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        projects = m.get(
+            f"{rg.RESGEN_HOST}/api/v1/projects/",
+            json={"count": 1, "results": [{"uuid": "p1"}]},
+        )
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+
+        assert rgc.find_or_create_project("proj").uuid == "p1"
+        assert rgc.find_or_create_project("proj").uuid == "p1"
+        assert rgc.find_project("proj").uuid == "p1"
+        assert rgc.find_project("proj").uuid == "p1"
+        assert projects.call_count == 2
+
+        rgc.invalidate_cache()
+        rgc.find_project("proj")
+        assert projects.call_count == 3
+
+
+def test_unexpected_status_raises():
+    with requests_mock.Mocker() as m:
+        m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": "xy"})
+        m.get(f"{rg.RESGEN_HOST}/api/v1/projects/", status_code=500)
+        rgc = rg.ResgenConnection("user", "password", cache_token=False)
+
+        with pytest.raises(rg.UnknownConnectionException):
+            rgc.list_projects()
+
+
+def test_gene_annotation():
+    gene_info = {"geneName": "BRCA1", "txStart": "100", "txEnd": 200, "chr": "chr2"}
+    gene = rg.GeneAnnotation(gene_info)
+    chrom_info = rg.get_chrominfo_from_string("chr1\t1000\nchr2\t5000\n")
+
+    assert chrom_info.to_gene_range(gene) == [1100, 1200]
+    assert chrom_info.to_gene_range(gene, padding=0.5) == [1050, 1250]
+
+    genes = [gene, rg.GeneAnnotation({**gene_info, "chr": "chr1"})]
+    ranges = chrom_info.to_gene_ranges(genes, padding=0.5)
+
+    assert ranges.tolist() == [[1050, 1250], [50, 250]]
+
+
+def test_token_cache():
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": 4e9}).encode())
+    token = f"header.{payload.decode().rstrip('=')}.signature"
+
+    cache_dir = rg.Path(tempfile.mkdtemp())
+
+    with patch("resgen.TOKEN_CACHE_DIR", cache_dir):
+        with requests_mock.Mocker() as m:
+            login = m.post(
+                f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", json={"access_token": token}
+            )
+            m.get(f"{rg.RESGEN_HOST}/api/v1/projects/", json={"results": []})
+
+            rg.ResgenConnection("user", "password")
+            rgc = rg.ResgenConnection("user", "password")
+            rgc.list_projects()
+
+            assert login.call_count == 1
+            assert rgc.token == token
+            assert m.last_request.headers["Authorization"] == f"Bearer {token}"
+
+        # only the cached token is left and only its owner can read it
+        (cached,) = cache_dir.iterdir()
+        assert cached == rg.token_cache_path(rg.RESGEN_HOST, "user")
+        assert cached.stat().st_mode & 0o777 == 0o600
+
+        # the cached token isn't used with different credentials
+        with requests_mock.Mocker() as m:
+            login = m.post(f"{rg.RESGEN_AUTH0_DOMAIN}/oauth/token/", status_code=400)
+
+            with pytest.raises(rg.InvalidCredentialsException):
+                rg.ResgenConnection("user", "wrong")
+            assert login.call_count == 1
+
+            with pytest.raises(rg.InvalidCredentialsException):
+                rg.ResgenConnection("user", "password", host="https://other.host")
+
+
+def test_sync_dataset_tags():
+    project = rg.ResgenProject("xxx", MagicMock())
+    project.add_dataset = MagicMock(return_value="yy")
+    project.conn.find_datasets.return_value = []
+
+    project.sync_dataset(
+        "/tmp/blah.mcool",
+        filetype="cooler",
+        datatype="matrix",
+        tags=[{"name": "datatype:vector"}, {"name": "cell:a"}],
+        name="blah",
+    )
+
+    uuid, to_update = project.conn.update_dataset.call_args[0]
+    assert uuid == "yy"
+    assert to_update == {
+        "name": "blah",
+        "tags": [
+            {"name": "cell:a"},
+            {"name": "filetype:cooler"},
+            {"name": "datatype:matrix"},
+        ],
+    }
+
+
+def test_dataset_tag_values():
+    dataset = rg.ResgenDataset(
+        MagicMock(),
+        {
+            "uuid": "xx",
+            "datafile": "aws/xx/blah.mcool",
+            "tags": [{"name": "datatype:matrix"}, {"name": "assembly:hg38"}],
+        },
+    )
+
+    assert rg.ds_filename(dataset) == "blah.mcool"
+    assert rg.ds_filename(dataset, full_path=True) == "aws/xx/blah.mcool"
+    assert dataset.datatype == "matrix"
+    assert dataset.assembly == "hg38"
+    assert dataset.filetype is None
+
+    dataset.conn.update_dataset.return_value = rg.ResgenDataset(
+        dataset.conn,
+        {"uuid": "xx", "datafile": "blah.mcool", "tags": [{"name": "datatype:x"}]},
+    )
+    dataset.update(tags=[{"name": "datatype:x"}])
+
+    assert dataset.datatype == "x"
@@ -0,0 +1,68 @@
+import pytest
+
+import resgen as rg
+
+httpx = pytest.importorskip("httpx")
+
+from resgen.http2 import HttpxSession  # noqa: E402
+
+
+def test_httpx_session(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+
+        if request.url.path == "/oauth/token/":
+            return httpx.Response(200, json={"access_token": "xy"})
+
+        return httpx.Response(200, text="chr1\t10\nchr2\t5\n")
+
+    session = HttpxSession()
+    session.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr("resgen.http2.HttpxSession", lambda: session)
+    rgc = rg.ResgenConnection("user", "password", http2=True, cache_token=False)
+
+    dataset = rg.ResgenDataset(rgc, {"uuid": "c1", "datafile": "x"})
+    chrom_info = rgc.get_chrominfo(dataset)
+
+    assert chrom_info.chrom_order == ["chr1", "chr2"]
+    assert "authorization" not in requests[0].headers
+    assert requests[1].headers["authorization"] == "Bearer xy"
+    assert requests[1].url.params["id"] == "c1"
+
+
+def test_httpx_session_stream():
+    def handler(request):
+        return httpx.Response(404, content=iter([b"not ", b"found"]))
+
+    session = HttpxSession()
+    session.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    ret = session.get("https://resgen.io/", stream=True)
+    assert not ret.is_stream_consumed
+    assert ret.content == b"not found"
+    ret.close()
+
+
+def test_httpx_session_errors():
+    def handler(request):
+        if request.url.path == "/stream/":
+            return httpx.Response(200, content=broken_stream())
+
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    def broken_stream():
+        yield b"data: {}\n"
+        raise httpx.RemoteProtocolError("connection lost")
+
+    session = HttpxSession()
+    session.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(rg.requests.Timeout):
+        session.get("https://resgen.io/")
+
+    ret = session.get("https://resgen.io/stream/", stream=True)
+    with pytest.raises(rg.requests.ConnectionError):
+        list(ret.iter_lines())